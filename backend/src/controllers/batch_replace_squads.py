@@ -4,19 +4,42 @@ Batch replacement script to wrap all Squads calls with escrow checks
 """
 import re
 
+# Pattern 1: proposeWinnerPayout calls, compiled once rather than on every wrap
+_PROPOSE_PATTERN = re.compile(
+    r'(\s+)(const proposalResult = await (?:squadsVaultService|squadsService)\.proposeWinnerPayout\()'
+)
+
+def _call_args(text: str, open_idx: int) -> str:
+    """Return the argument text of the call whose '(' is at open_idx, counting nested parentheses"""
+    depth = 0
+    for i in range(open_idx, len(text)):
+        if text[i] == '(':
+            depth += 1
+        elif text[i] == ')':
+            depth -= 1
+            if depth == 0:
+                return text[open_idx + 1:i]
+    return text[open_idx + 1:]
+
 # Read the file
 with open('matchController.ts', 'r', encoding='utf-8') as f:
     content = f.read()
 
 # Pattern 1: Wrap proposeWinnerPayout calls
-def wrap_propose_winner_payout(match):
-    pattern = r'(\s+)(const proposalResult = await (?:squadsVaultService|squadsService)\.proposeWinnerPayout\()'
-    
+def wrap_propose_winner_payout(content: str) -> str:
     def replacement(m):
         indent = m.group(1)
         call_start = m.group(2)
+        # The match variable is only visible in the call's arguments, not the matched prefix
+        args = _call_args(m.string, m.end() - 1)
+        match_var = (
+            'reloadedMatch' if 'reloadedMatch' in args
+            else 'updatedMatch' if 'updatedMatch' in args
+            else 'match' if 'match' in args
+            else 'freshMatch'
+        )
         return f"""{indent}// Check if match uses escrow or Squads
-{indent}const matchSystem = getMatchSystem({'reloadedMatch' if 'reloadedMatch' in match else 'updatedMatch' if 'updatedMatch' in match else 'match' if 'match' in match else 'freshMatch'});
+{indent}const matchSystem = getMatchSystem({match_var});
 {indent}if (matchSystem === 'escrow') {{
 {indent}  // NEW ESCROW SYSTEM: Settlement is handled by frontend/player calling settleMatch
 {indent}  console.log('✅ Escrow match - winner payout settlement will be triggered by player or frontend');
@@ -25,7 +48,7 @@ def wrap_propose_winner_payout(match):
 {indent}  // OLD SQUADS SYSTEM: Use Squads proposal
 {indent}{call_start}"""
     
-    return re.sub(pattern, replacement, content)
+    return _PROPOSE_PATTERN.sub(replacement, content)
 
 # For now, let's just count and show what needs to be replaced
 print("This script would wrap all Squads calls. Manual replacement is safer for this large file.")
@@ -11,33 +11,105 @@ Script to remove all Squads-related code from matchController.ts
 import re
 import sys
 
-def remove_squads_code(content: str) -> str:
-    """Remove all Squads-related code"""
+import ts_source
+
+# Squads import/instantiation lines, compiled once and matched in a single pass over the file
+_RE_SQUADS_IMPORTS = re.compile(
+    rb"(?:^[ \t]*)?// Import Squads service[^\n]*\n[ \t]*const \{ squadsVaultService \} = require\('\.\./services/squadsVaultService'\);[^\n]*\n"
+    rb"|^[ \t]*const \{ SquadsVaultService \} = require\('\.\./services/squadsVaultService'\);[^\n]*\n"
+    rb"|^[ \t]*const squadsService = new SquadsVaultService\(\);[^\n]*\n",
+    re.MULTILINE
+)
+
+# The import lines exactly as the generator writes them; the regex above is only the fallback.
+# Like the regex, the squadsVaultService import is only removed together with the
+# '// Import Squads service' comment on the line above it.
+_COMMENTED_LITERAL_IMPORT = b"const { squadsVaultService } = require('../services/squadsVaultService');\n"
+_LITERAL_IMPORTS = (
+    b"const { SquadsVaultService } = require('../services/squadsVaultService');\n",
+    b"const squadsService = new SquadsVaultService();\n",
+)
+_IMPORT_COMMENT = b'// Import Squads service'
+# Everything removed contains one of these; if none appear the file is already clean
+_SQUADS_TOKENS = (b'squadsVaultService', b'SquadsVaultService', b'getMatchSystem')
+# Every import line contains exactly one of these, so counting them tells us
+# whether the literal pass accounted for all of them
+_IMPORT_TOKENS = (
+    b"require('../services/squadsVaultService');",
+    b'new SquadsVaultService();',
+)
+
+def _find_all(source, needle: bytes):
+    """Yield every start offset of needle in source"""
+    i = source.find(needle)
+    while i != -1:
+        yield i
+        i = source.find(needle, i + len(needle))
+
+def _import_spans(source) -> list:
+    """Return the spans of the Squads import lines, using plain find() for exact lines"""
+    spans = []
+    for literal in (_COMMENTED_LITERAL_IMPORT,) + _LITERAL_IMPORTS:
+        for i in _find_all(source, literal):
+            # Whole (possibly indented) lines only; anything else before the hit
+            # means it's e.g. a commented-out import
+            start = source.rfind(b'\n', 0, i) + 1
+            if source[start:i].strip():
+                continue
+            if literal is _COMMENTED_LITERAL_IMPORT:
+                prev = source.rfind(b'\n', 0, start - 1) + 1
+                comment = source.find(_IMPORT_COMMENT, prev, start) if start else -1
+                if comment == -1:
+                    continue
+                # Take an indented comment's indent with it
+                start = prev if not source[prev:comment].strip() else comment
+            spans.append((start, i + len(literal)))
     
-    # Remove getMatchSystem function
-    content = re.sub(
-        r'/\*\*\s*\n\s*\* Helper function to determine if a match uses escrow.*?\n\s*\*/\s*\nfunction getMatchSystem\([^)]+\):.*?\{[^}]*return null;\s*\}',
-        '',
-        content,
-        flags=re.DOTALL
-    )
+    # Fall back to the regex when a line carries trailing content the literals don't cover
+    expected = sum(1 for token in _IMPORT_TOKENS for _ in _find_all(source, token))
+    if len(spans) < expected:
+        spans.extend(m.span() for m in _RE_SQUADS_IMPORTS.finditer(source))
+    return spans
+
+def _get_match_system_span(source):
+    """Return the (start, end) span of the getMatchSystem() helper and its JSDoc comment, or None"""
+    marker = source.find(b'Helper function to determine if a match uses escrow')
+    if marker == -1:
+        return None
+    # The marker must sit inside a JSDoc comment that directly precedes the function
+    start = source.rfind(b'/**', 0, marker)
+    if start == -1:
+        return None
+    comment_end = source.find(b'*/', start + 3)
+    if comment_end == -1 or comment_end < marker:
+        return None
+    header = source.find(b'function getMatchSystem(', comment_end)
+    if header == -1 or source[comment_end + 2:header].strip():
+        return None
+    # Start after the parameter list so braces in parameter types aren't taken for the body
+    params_end = source.find(b')', header)
+    body = source.find(b'{', params_end) if params_end != -1 else -1
+    if body == -1:
+        return None
+    end = ts_source.find_block_end(source, body)
+    if end == -1:
+        return None
+    return start, end
+
+def squads_spans(source) -> list:
+    """Collect the (start, end) byte spans of Squads-related code in source (bytes or mmap)"""
+    if all(source.find(token) == -1 for token in _SQUADS_TOKENS):
+        return []
+    
+    spans = []
+    
+    # getMatchSystem function
+    span = _get_match_system_span(source)
+    if span is not None:
+        spans.append(span)
     
-    # Remove Squads service imports
-    content = re.sub(
-        r"// Import Squads service[^\n]*\nconst \{ squadsVaultService \} = require\('\.\./services/squadsVaultService'\);[^\n]*\n",
-        '',
-        content
-    )
-    content = re.sub(
-        r"const \{ SquadsVaultService \} = require\('\.\./services/squadsVaultService'\);[^\n]*\n",
-        '',
-        content
-    )
-    content = re.sub(
-        r"const squadsService = new SquadsVaultService\(\);[^\n]*\n",
-        '',
-        content
-    )
+    # Squads service imports
+    spans.extend(_import_spans(source))
     
     # Pattern 1: Remove entire else-if squads blocks
     # Match: else if (matchSystem === 'squads') { ... entire block ... }
@@ -49,7 +121,14 @@ def remove_squads_code(content: str) -> str:
     # Pattern 3: Remove getMatchSystem() calls and the variable assignment
     # const matchSystem = getMatchSystem(...); -> remove
     
-    return content
+    return spans
+
+def remove_squads_code(content: str) -> str:
+    """Remove all Squads-related code"""
+    if not any(token.decode() in content for token in _SQUADS_TOKENS):
+        return content
+    source = content.encode('utf-8')
+    return ts_source.splice(source, squads_spans(source)).decode('utf-8')
 
 if __name__ == '__main__':
     if len(sys.argv) < 2:
@@ -57,13 +136,15 @@ if __name__ == '__main__':
         sys.exit(1)
     
     filepath = sys.argv[1]
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
+    with ts_source.load(filepath) as source:
+        spans = squads_spans(source)
+        cleaned = ts_source.splice(source, spans) if spans else None
     
-    cleaned = remove_squads_code(content)
+    if cleaned is None:
+        print(f"Nothing to clean in {filepath}")
+        sys.exit(0)
     
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(cleaned)
+    ts_source.write_atomic(filepath, cleaned)
     
     print(f"Cleaned {filepath}")
 
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the matchController.ts rewrite scripts
+- Maps the source file read-only instead of copying it into a str
+- Scans TypeScript braces while skipping strings, template literals and comments
+- Rebuilds the output from the untouched regions around removed spans
+- Writes results atomically so an interrupted run can't truncate the source
+"""
+
+import contextlib
+import mmap
+import os
+import re
+import shutil
+
+# Bytes the brace scan has to look at; everything in between is skipped by the regex engine
+_RE_TOKEN = re.compile(rb'//|/\*|\*/|\\[\s\S]|[{}\'"`\n]')
+_QUOTES = (b'"', b"'", b'`')
+
+@contextlib.contextmanager
+def load(path: str):
+    """Map a source file read-only for the duration of the block.
+
+    Yields b'' for an empty file, which mmap refuses to map. Leave the block
+    before writing back to the same path.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        yield source
+    finally:
+        source.close()
+
+def code_tokens(source, start: int = 0, end: int = None):
+    """Yield (offset, token) for every newline and every '{' / '}' that is code.
+
+    Braces inside strings, template literals and comments are skipped. Plain
+    quotes and line comments end at a newline; template literals and block
+    comments run on across lines. source may be bytes or an mmap; the scan
+    covers source[start:end].
+    """
+    context = b''  # construct currently open: a quote, b'//' or b'*/'
+    for m in _RE_TOKEN.finditer(source, start, len(source) if end is None else end):
+        tok = m.group()
+        if tok[-1:] == b'\n':
+            # A backslash-newline continues a quoted string but ends anything else that ends at a newline
+            if context == b'//' or (tok == b'\n' and context in (b'"', b"'")):
+                context = b''
+            yield m.end() - 1, b'\n'
+        elif context:
+            if tok == context:
+                context = b''
+        elif tok in _QUOTES:
+            context = tok
+        elif tok == b'//':
+            context = b'//'
+        elif tok == b'/*':
+            context = b'*/'
+        elif tok == b'{' or tok == b'}':
+            yield m.start(), tok
+
+def find_block_end(source, open_idx: int) -> int:
+    """Return the offset just past the '}' closing the '{' at open_idx, or -1"""
+    depth = 0
+    for offset, tok in code_tokens(source, open_idx):
+        if tok == b'{':
+            depth += 1
+        elif tok == b'}':
+            depth -= 1
+            if depth == 0:
+                return offset + 1
+    return -1
+
+def brace_delta(source, start: int = 0, end: int = None) -> int:
+    """Return the net '{' minus '}' count of the code in source[start:end]"""
+    delta = 0
+    for _, tok in code_tokens(source, start, end):
+        if tok == b'{':
+            delta += 1
+        elif tok == b'}':
+            delta -= 1
+    return delta
+
+def splice(source, spans) -> bytes:
+    """Return source with every (start, end) span removed; overlapping spans are merged"""
+    parts = []
+    pos = 0
+    for start, end in sorted(spans):
+        if start > pos:
+            parts.append(source[pos:start])
+        pos = max(pos, end)
+    parts.append(source[pos:])
+    return b''.join(parts)
+
+def write_atomic(path: str, *chunks: bytes) -> None:
+    """Write chunks to a temp file next to path, then rename it over path keeping its mode"""
+    tmp = path + '.tmp'
+    try:
+        with open(tmp, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        shutil.copymode(path, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
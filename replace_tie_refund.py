@@ -1,179 +1,196 @@
-import sys
 import os
+import sys
+
+# Shared helpers live next to the other matchController.ts rewrite scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend', 'src', 'controllers'))
+import ts_source
 
 # Change to working directory
 os.chdir('/tmp/guess5-fix')
 
-with open('backend/src/controllers/matchController.ts', 'r', encoding='utf-8') as f:
-    lines = f.readlines()
-
-# Find losing tie section
-start_idx = None
-for i, line in enumerate(lines):
-    if '// Losing tie - both players get 95% refund' in line:
-        start_idx = i
-        break
-
-if start_idx is None:
-    print('Could not find losing tie section')
-    sys.exit(1)
-
-# Find end by counting braces
-brace_count = 0
-end_idx = None
-found_start = False
-for i in range(start_idx, min(start_idx + 150, len(lines))):
-    line = lines[i]
-    if '{' in line:
-        found_start = True
-        brace_count += line.count('{')
-    if '}' in line:
-        brace_count -= line.count('}')
-        if found_start and brace_count == 0:
-            end_idx = i + 1
-            break
-
-if end_idx is None:
-    print('Could not find end')
-    sys.exit(1)
-
-print(f'Replacing lines {start_idx + 1} to {end_idx}')
-
-# Create replacement - using proper escape sequences for shell
-replacement_lines = [
-            "          // Losing tie - both players get 95% refund via Squads\n",
-            "            console.log('🤝 Losing tie - processing 95% refunds to both players via Squads...');\n",
-            "            \n",
-            "            const entryFee = updatedMatch.entryFee;\n",
-            "            const refundAmount = entryFee * 0.95; // 95% refund to each player\n",
-            "            \n",
-            "            // Check if vault address exists\n",
-            "            if (!updatedMatch.squadsVaultAddress) {\n",
-            "              console.error('❌ Cannot create tie refund proposal: missing squadsVaultAddress', {\n",
-            "                matchId: updatedMatch.id,\n",
-            "                player1: updatedMatch.player1,\n",
-            "                player2: updatedMatch.player2,\n",
-            "              });\n",
-            "              throw new Error('Cannot create tie refund: missing squadsVaultAddress');\n",
-            "            }\n",
-            "            \n",
-            "            // Create Squads proposal for tie refund\n",
-            "            try {\n",
-            "              const refundResult = await squadsVaultService.proposeTieRefund(\n",
-            "                updatedMatch.squadsVaultAddress,\n",
-            "                new PublicKey(updatedMatch.player1),\n",
-            "                new PublicKey(updatedMatch.player2),\n",
-            "                refundAmount\n",
-            "              );\n",
-            "              \n",
-            "              if (refundResult.success) {\n",
-            "                console.log('✅ Squads tie refund proposal created:', refundResult.proposalId);\n",
-            "                \n",
-            "                // Update match with proposal information\n",
-            "                updatedMatch.payoutProposalId = refundResult.proposalId;\n",
-            "                updatedMatch.proposalCreatedAt = new Date();\n",
-            "                updatedMatch.proposalStatus = 'ACTIVE';\n",
-            "                updatedMatch.needsSignatures = 2; // 2-of-3 multisig\n",
-            "                updatedMatch.matchStatus = 'PROPOSAL_CREATED';\n",
-            "                \n",
-            "                // Save the match with proposal information\n",
-            "                await matchRepository.save(updatedMatch);\n",
-            "                console.log('✅ Match saved with tie refund proposal:', {\n",
-            "                  matchId: updatedMatch.id,\n",
-            "                  proposalId: refundResult.proposalId,\n",
-            "                  proposalStatus: 'ACTIVE',\n",
-            "                  needsSignatures: 2,\n",
-            "                });\n",
-            "                \n",
-            "                // Create payment instructions for display\n",
-            "                const paymentInstructions = {\n",
-            "                  winner: 'tie',\n",
-            "                  player1: updatedMatch.player1,\n",
-            "                  player2: updatedMatch.player2,\n",
-            "                  refundAmount: refundAmount,\n",
-            "                  feeAmount: entryFee * 0.05 * 2,\n",
-            "                  feeWallet: FEE_WALLET_ADDRESS,\n",
-            "                  squadsProposal: true,\n",
-            "                  proposalId: refundResult.proposalId,\n",
-            "                  transactions: [\n",
-            "                    {\n",
-            "                      from: 'Squads Vault',\n",
-            "                      to: updatedMatch.player1,\n",
-            "                      amount: refundAmount,\n",
-            "                      description: 'Losing tie refund (player 1)'\n",
-            "                    },\n",
-            "                    {\n",
-            "                      from: 'Squads Vault',\n",
-            "                      to: updatedMatch.player2,\n",
-            "                      amount: refundAmount,\n",
-            "                      description: 'Losing tie refund (player 2)'\n",
-            "                    }\n",
-            "                  ]\n",
-            "                };\n",
-            "                \n",
-            "                (payoutResult as any).paymentInstructions = paymentInstructions;\n",
-            "                (payoutResult as any).paymentSuccess = true;\n",
-            "                \n",
-            "              } else {\n",
-            "                console.error('❌ Squads tie refund proposal failed:', refundResult.error);\n",
-            "                throw new Error(`Squads proposal failed: ${refundResult.error}`);\n",
-            "              }\n",
-            "              \n",
-            "            } catch (error: unknown) {\n",
-            "              const errorMessage = error instanceof Error ? error.message : String(error);\n",
-            "              console.warn('⚠️ Squads tie refund proposal failed, falling back to manual instructions:', errorMessage);\n",
-            "              \n",
-            "              // Fallback to manual payment instructions\n",
-            "              const paymentInstructions = {\n",
-            "                winner: 'tie',\n",
-            "                player1: updatedMatch.player1,\n",
-            "                player2: updatedMatch.player2,\n",
-            "                refundAmount: refundAmount,\n",
-            "                feeAmount: entryFee * 0.05 * 2,\n",
-            "                feeWallet: FEE_WALLET_ADDRESS,\n",
-            "                squadsProposal: false,\n",
-            "                transactions: [\n",
-            "                  {\n",
-            "                    from: 'Squads Vault',\n",
-            "                    to: updatedMatch.player1,\n",
-            "                    amount: refundAmount,\n",
-            "                    description: 'Manual losing tie refund (player 1) - contact support'\n",
-            "                  },\n",
-            "                  {\n",
-            "                    from: 'Squads Vault',\n",
-            "                    to: updatedMatch.player2,\n",
-            "                    amount: refundAmount,\n",
-            "                    description: 'Manual losing tie refund (player 2) - contact support'\n",
-            "                  }\n",
-            "                ]\n",
-            "              };\n",
-            "              \n",
-            "              (payoutResult as any).paymentInstructions = paymentInstructions;\n",
-            "              (payoutResult as any).paymentSuccess = false;\n",
-            "              (payoutResult as any).paymentError = 'Squads proposal failed - contact support';\n",
-            "              \n",
-            "              console.log('⚠️ Manual losing tie refund instructions created');\n",
-            "            }\n",
-            "          }\n"
-]
-
-# Replace
-new_lines = lines[:start_idx] + replacement_lines + lines[end_idx:]
-with open('backend/src/controllers/matchController.ts', 'w', encoding='utf-8') as f:
-    f.writelines(new_lines)
+CONTROLLER_PATH = 'backend/src/controllers/matchController.ts'
+MARKER = '// Losing tie - both players get 95% refund'
+SEARCH_WINDOWS = (150, 300, 600)
+
+
+def _find_section_end(source, start: int):
+    """Scan TypeScript from start to the '}' that closes the block enclosing the
+    section, ignoring braces inside strings, template literals and comments.
+
+    REPLACEMENT_BLOCK ends with that closing brace, so the section runs through the
+    whole line it sits on. Returns (offset just past that line, lines scanned), with
+    None as the offset if the file ends first.
+    """
+    depth = 0
+    lines = 0
+    windows = iter(SEARCH_WINDOWS)
+    window = next(windows, None)
+    for offset, tok in ts_source.code_tokens(source, start):
+        if tok == b'\n':
+            lines += 1
+            if lines == window:
+                print(f'End not found within {window} lines, widening search')
+                window = next(windows, None)
+        elif tok == b'{':
+            depth += 1
+        else:
+            depth -= 1
+            if depth < 0:
+                line_end = source.find(b'\n', offset)
+                return (len(source) if line_end == -1 else line_end + 1), lines + 1
+    return None, lines
+
+# Replacement section, kept as one block so it is written in a single call
+REPLACEMENT_BLOCK = """          // Losing tie - both players get 95% refund via Squads
+            console.log('🤝 Losing tie - processing 95% refunds to both players via Squads...');
+            
+            const entryFee = updatedMatch.entryFee;
+            const refundAmount = entryFee * 0.95; // 95% refund to each player
+            
+            // Check if vault address exists
+            if (!updatedMatch.squadsVaultAddress) {
+              console.error('❌ Cannot create tie refund proposal: missing squadsVaultAddress', {
+                matchId: updatedMatch.id,
+                player1: updatedMatch.player1,
+                player2: updatedMatch.player2,
+              });
+              throw new Error('Cannot create tie refund: missing squadsVaultAddress');
+            }
+            
+            // Create Squads proposal for tie refund
+            try {
+              const refundResult = await squadsVaultService.proposeTieRefund(
+                updatedMatch.squadsVaultAddress,
+                new PublicKey(updatedMatch.player1),
+                new PublicKey(updatedMatch.player2),
+                refundAmount
+              );
+              
+              if (refundResult.success) {
+                console.log('✅ Squads tie refund proposal created:', refundResult.proposalId);
+                
+                // Update match with proposal information
+                updatedMatch.payoutProposalId = refundResult.proposalId;
+                updatedMatch.proposalCreatedAt = new Date();
+                updatedMatch.proposalStatus = 'ACTIVE';
+                updatedMatch.needsSignatures = 2; // 2-of-3 multisig
+                updatedMatch.matchStatus = 'PROPOSAL_CREATED';
+                
+                // Save the match with proposal information
+                await matchRepository.save(updatedMatch);
+                console.log('✅ Match saved with tie refund proposal:', {
+                  matchId: updatedMatch.id,
+                  proposalId: refundResult.proposalId,
+                  proposalStatus: 'ACTIVE',
+                  needsSignatures: 2,
+                });
+                
+                // Create payment instructions for display
+                const paymentInstructions = {
+                  winner: 'tie',
+                  player1: updatedMatch.player1,
+                  player2: updatedMatch.player2,
+                  refundAmount: refundAmount,
+                  feeAmount: entryFee * 0.05 * 2,
+                  feeWallet: FEE_WALLET_ADDRESS,
+                  squadsProposal: true,
+                  proposalId: refundResult.proposalId,
+                  transactions: [
+                    {
+                      from: 'Squads Vault',
+                      to: updatedMatch.player1,
+                      amount: refundAmount,
+                      description: 'Losing tie refund (player 1)'
+                    },
+                    {
+                      from: 'Squads Vault',
+                      to: updatedMatch.player2,
+                      amount: refundAmount,
+                      description: 'Losing tie refund (player 2)'
+                    }
+                  ]
+                };
+                
+                (payoutResult as any).paymentInstructions = paymentInstructions;
+                (payoutResult as any).paymentSuccess = true;
+                
+              } else {
+                console.error('❌ Squads tie refund proposal failed:', refundResult.error);
+                throw new Error(`Squads proposal failed: ${refundResult.error}`);
+              }
+              
+            } catch (error: unknown) {
+              const errorMessage = error instanceof Error ? error.message : String(error);
+              console.warn('⚠️ Squads tie refund proposal failed, falling back to manual instructions:', errorMessage);
+              
+              // Fallback to manual payment instructions
+              const paymentInstructions = {
+                winner: 'tie',
+                player1: updatedMatch.player1,
+                player2: updatedMatch.player2,
+                refundAmount: refundAmount,
+                feeAmount: entryFee * 0.05 * 2,
+                feeWallet: FEE_WALLET_ADDRESS,
+                squadsProposal: false,
+                transactions: [
+                  {
+                    from: 'Squads Vault',
+                    to: updatedMatch.player1,
+                    amount: refundAmount,
+                    description: 'Manual losing tie refund (player 1) - contact support'
+                  },
+                  {
+                    from: 'Squads Vault',
+                    to: updatedMatch.player2,
+                    amount: refundAmount,
+                    description: 'Manual losing tie refund (player 2) - contact support'
+                  }
+                ]
+              };
+              
+              (payoutResult as any).paymentInstructions = paymentInstructions;
+              (payoutResult as any).paymentSuccess = false;
+              (payoutResult as any).paymentError = 'Squads proposal failed - contact support';
+              
+              console.log('⚠️ Manual losing tie refund instructions created');
+            }
+          }
+"""
+
+with ts_source.load(CONTROLLER_PATH) as source:
+    # Find losing tie section with a single scan over the whole file
+    pos = source.find(MARKER.encode('utf-8'))
+    if pos == -1:
+        print('Could not find losing tie section')
+        sys.exit(1)
+    start = source.rfind(b'\n', 0, pos) + 1
+    prefix = source[:start]
+    start_idx = prefix.count(b'\n')
+
+    # Find end by counting braces from the marker. The enclosing block normally closes
+    # within 150 lines; the scan reports each window it outgrows and carries on to the
+    # end of the file.
+    end, line_count = _find_section_end(source, start)
+    if end is None:
+        print('Could not find end')
+        sys.exit(1)
+    end_idx = start_idx + line_count
+
+    # The replacement has to leave the surrounding code's nesting as it found it
+    section_delta = ts_source.brace_delta(source, start, end)
+    replacement = REPLACEMENT_BLOCK.encode('utf-8')
+    replacement_delta = ts_source.brace_delta(replacement)
+    if section_delta != replacement_delta:
+        print(f'Replacement would unbalance braces: lines {start_idx + 1} to {end_idx} '
+              f'net {section_delta:+d}, replacement net {replacement_delta:+d}')
+        sys.exit(1)
+
+    print(f'Replacing lines {start_idx + 1} to {end_idx}')
+
+    tail = source[end:]
+
+# Write once the map is released; write_atomic goes through a temp file so the
+# controller is never left half-written
+ts_source.write_atomic(CONTROLLER_PATH, prefix, replacement, tail)
 
 print('Successfully replaced with Squads proposal')
-
-
-
-
-
-
-
-
-
-
-
-
-
-